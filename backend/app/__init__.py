@@ -1,14 +1,74 @@
 import os
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from flask.logging import default_handler
 from flask_cors import CORS
+from sqlalchemy import event
 from dotenv import load_dotenv
 
 load_dotenv()
 
-db = SQLAlchemy()
-migrate = Migrate()
+from app.extensions import db, migrate
+from app.config import config_by_name
+
+# Started by the first app that sets up logging; app.logger is the shared
+# "app" logger, so later apps in the same process reuse this pipeline
+_log_listener = None
+
+
+def setup_logging(app):
+    """Write application logs to a file from a background thread"""
+    global _log_listener
+
+    if app.testing:
+        return
+
+    # Flask already logs at DEBUG in debug mode
+    if not app.debug:
+        app.logger.setLevel(logging.INFO)
+
+    if _log_listener is not None:
+        app.extensions["log_listener"] = _log_listener
+        return
+
+    log_dir = os.path.join(app.instance_path, "logs")
+    os.makedirs(log_dir, exist_ok=True)
+
+    # Every gunicorn worker appends to the same file, and in-process rotation
+    # would have one worker rename it while others keep writing to the old
+    # copy. The file is reopened if it moves, so rotate it externally
+    # (e.g. logrotate) instead.
+    file_handler = WatchedFileHandler(os.path.join(log_dir, "app.log"))
+    file_handler.setFormatter(
+        logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s")
+    )
+
+    # Request threads only enqueue records; the listener thread does the
+    # formatting and writing for both the file and the console
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(
+        log_queue, file_handler, default_handler, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(QueueHandler(log_queue))
+    app.extensions["log_listener"] = listener
+    _log_listener = listener
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Use WAL journaling so readers aren't blocked by the writer's commits"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
 
 
 def create_app(config_name=None):
@@ -16,20 +76,22 @@ def create_app(config_name=None):
     app = Flask(__name__, instance_relative_config=True)
 
     # Set up configuration
-    from app.config import config_by_name
-
     config_obj = config_by_name.get(
         config_name or os.environ.get("FLASK_ENV", "development")
     )
     app.config.from_object(config_obj)
 
     # Set up logging
-    # setup_logging(app)
+    setup_logging(app)
 
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
 
+    with app.app_context():
+        if db.engine.dialect.name == "sqlite":
+            event.listen(db.engine, "connect", set_sqlite_pragmas)
+
     CORS(
         app,
         resources={
@@ -49,22 +111,13 @@ def create_app(config_name=None):
     except OSError:
         app.logger.warning(f"Error creating instance directory at {app.instance_path}")
 
-    # Register blueprints
+    # Register blueprints. Imported here: routes imports the models, which
+    # import app.extensions and so this package, and a module-level import
+    # would leave them partially initialized when imported first.
     from routes.routes import api_bp
 
     # NOTE: If your frontend calls /api/summarize, keep this prefix
     # If your frontend calls /summarize directly, remove the prefix
     app.register_blueprint(api_bp, url_prefix="/api")
 
-    # register_error_handlers(app)
-
-    app.logger.info(
-        f"Application initialized with {config_name or os.environ.get('FLASK_ENV', 'development')} configuration"
-    )
-    app.logger.info(f"Database: {app.config['SQLALCHEMY_DATABASE_URI']}")
-    app.logger.info(
-        f"Data cleanup interval: {app.config['DATA_CLEANUP_INTERVAL']} seconds"
-    )
-    app.logger.info(f"Data TTL: {app.config['DATA_TTL']}")
-
     return app
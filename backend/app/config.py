@@ -21,6 +21,13 @@ class Config:
         os.path.abspath(os.path.dirname(__file__)), "../instance/app.db"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": 10,  # Connections kept open for request and service threads
+        "max_overflow": 20,  # Extra connections allowed under bursts
+        "pool_timeout": 30,  # Seconds to wait for a free connection
+        "pool_pre_ping": True,  # Replace connections the server has dropped
+        "pool_recycle": 1800,  # Recycle connections older than 30 minutes
+    }
 
     # API settings
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max upload
@@ -36,8 +43,18 @@ class Config:
     MAX_RECORDS_PER_TABLE = int(
         os.environ.get("MAX_RECORDS_PER_TABLE", 1000)
     )  # Default 1000 records
+    # Default 10000 records deleted per transaction. At least 1, since a LIMIT
+    # of 0 (or a negative one, unlimited on SQLite) never ends the delete loop.
+    DATA_CLEANUP_BATCH_SIZE = max(
+        1, int(os.environ.get("DATA_CLEANUP_BATCH_SIZE", 10000))
+    )
     DATA_TTL = timedelta(hours=1)  # Time-to-live for database records
 
+    # Background write settings
+    WRITE_BATCH_SIZE = 100  # Maximum rows inserted per transaction
+    WRITE_QUEUE_SIZE = 1000  # Pending rows before falling back to synchronous writes
+    WRITE_FLUSH_INTERVAL = 0.1  # Seconds between queue drains
+
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -50,6 +67,8 @@ class TestingConfig(Config):
 
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    # In-memory SQLite uses a single static connection, not a QueuePool
+    SQLALCHEMY_ENGINE_OPTIONS = {}
     # Faster cleanup for testing
     DATA_CLEANUP_INTERVAL = 60  # 1 minute
     DATA_TTL = timedelta(minutes=5)
@@ -0,0 +1,7 @@
+from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
+
+# Keep attributes loaded after commit so reading e.g. summary.id doesn't
+# issue another SELECT to refresh the row
+db = SQLAlchemy(session_options={"expire_on_commit": False})
+migrate = Migrate()
@@ -0,0 +1,73 @@
+"""
+Create missing database tables and bring older schemas up to date
+
+Run once per deployment with `python bootstrap.py` (or RUN_DB_INIT=1)
+rather than from every worker process that imports the app. This is also
+the only place legacy rows without an expiration date get one; the cleanup
+service never deletes such rows until it has run.
+"""
+
+from app import create_app, db
+from migrate_db import (
+    add_expires_at_column,
+    backfill_missing_expiration_dates,
+    create_missing_indexes,
+)
+import sqlalchemy as sa
+
+
+def check_column_exists(inspector, tables, table_name, column_name):
+    """Check if a column exists in the database table"""
+    if table_name in tables:
+        columns = {col["name"] for col in inspector.get_columns(table_name)}
+        return column_name in columns
+    return False
+
+
+def ensure_schema(app):
+    """Create database tables if they don't exist and migrate them if needed"""
+    with app.app_context():
+        try:
+            # Read the schema over one connection that is closed afterwards
+            with db.engine.connect() as conn:
+                inspector = sa.inspect(conn)
+                tables = set(inspector.get_table_names())
+                summaries_has_expires = check_column_exists(
+                    inspector, tables, "summaries", "expires_at"
+                )
+                markdown_has_expires = check_column_exists(
+                    inspector, tables, "markdown_conversions", "expires_at"
+                )
+
+            # Check if tables exist before creating them
+            if "summaries" not in tables:
+                print("Creating database tables...")
+                db.create_all()
+                print("Database tables created successfully")
+            else:
+                print("Database tables already exist")
+
+                # Check if expires_at column exists in the tables
+                if not summaries_has_expires or not markdown_has_expires:
+                    print("Database tables need migration to add expires_at column")
+
+                    # Run the migration in this process, against the same app
+                    try:
+                        print("Running database migration...")
+                        add_expires_at_column(app)
+                        print("Database migration completed")
+                    except Exception as e:
+                        print(f"Error during migration: {e}")
+                        print("You may need to run the migration script manually")
+                else:
+                    print("Database schema is up to date")
+                    backfill_missing_expiration_dates(app)
+
+                create_missing_indexes(app)
+
+        except Exception as e:
+            print(f"Error checking/creating database tables: {e}")
+
+
+if __name__ == "__main__":
+    ensure_schema(create_app())
@@ -0,0 +1,14 @@
+import os
+
+# Serve the same application object as the development server
+wsgi_app = "run:app"
+bind = f"0.0.0.0:{os.environ.get('PORT', 5001)}"
+
+# Threaded workers let requests overlap while one is blocked on a DB commit
+# or the summarizer, instead of tying up a whole process per request
+worker_class = "gthread"
+workers = int(os.environ.get("GUNICORN_WORKERS", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+
+# Keep browser connections open between the frontend's preflight and POST
+keepalive = 5
@@ -5,6 +5,7 @@ Migration script to add expires_at column to existing tables
 import sys
 from datetime import datetime, timedelta
 from pathlib import Path
+import sqlalchemy as sa
 
 # Add the project root directory to the Python path
 project_root = Path(__file__).parent.absolute()
@@ -14,9 +15,71 @@ from app import create_app, db
 from models.summary import Summary, MarkdownConversion
 
 
-def add_expires_at_column():
+def created_at_plus(conn, table, ttl):
+    """SQL expression for a row's created_at + ttl on the connection's dialect"""
+    seconds = int(ttl.total_seconds())
+    dialect = conn.dialect.name
+    # SQLite would add a datetime and an interval as numbers, and MySQL
+    # needs its own function
+    if dialect == "sqlite":
+        return sa.func.datetime(
+            table.c.created_at, f"+{seconds} seconds", type_=sa.DateTime
+        )
+    if dialect in ("mysql", "mariadb"):
+        return sa.func.timestampadd(
+            sa.text("SECOND"), seconds, table.c.created_at, type_=sa.DateTime
+        )
+    return table.c.created_at + ttl
+
+
+def backfill_expires_at(conn, model, now, ttl):
+    """Set expires_at on every row missing it with one CASE-based UPDATE"""
+    # Rows past their TTL expire right away, newer ones ttl after creation
+    table = model.__table__
+    conn.execute(
+        sa.update(table)
+        .where(table.c.expires_at.is_(None))
+        .values(
+            expires_at=sa.case(
+                (table.c.created_at <= now - ttl, now),
+                else_=created_at_plus(conn, table, ttl),
+            )
+        )
+    )
+
+
+def backfill_missing_expiration_dates(app):
+    """Give legacy rows saved without an expiration date one
+
+    New rows get expires_at by default, so only rows written before that
+    default existed can be missing it and this only needs to run once. It
+    runs from bootstrap.py (or RUN_DB_INIT=1), not from the cleanup service.
+    """
+    ttl = app.config.get("DATA_TTL", timedelta(hours=1))
+    now = datetime.utcnow()
+
+    with app.app_context():
+        with db.engine.begin() as conn:
+            for model in (Summary, MarkdownConversion):
+                backfill_expires_at(conn, model, now, ttl)
+
+
+def create_missing_indexes(app):
+    """Create any of the models' indexes the database doesn't have yet"""
+    # Built from the models' own definitions, so every dialect gets DDL it
+    # accepts. Tables created or migrated before the columns were indexed
+    # would otherwise make the cleanup service's queries scan them in full.
+    with app.app_context():
+        with db.engine.begin() as conn:
+            for model in (Summary, MarkdownConversion):
+                for index in model.__table__.indexes:
+                    index.create(conn, checkfirst=True)
+
+
+def add_expires_at_column(app=None):
     """Add expires_at column to existing tables if it doesn't exist"""
-    app = create_app()
+    if app is None:
+        app = create_app()
 
     with app.app_context():
         # Check if the columns exist in the tables
@@ -38,13 +101,18 @@ def add_expires_at_column():
             # Get data cleanup settings from config
             ttl = app.config.get("DATA_TTL", timedelta(hours=1))
 
-            # Create the columns using SQLAlchemy Core
+            # One cutoff time shared by every backfilled row
+            now = datetime.utcnow()
+
+            # Create the columns and backfill them in a single transaction
             with db.engine.begin() as conn:
                 if needs_summaries_migration:
                     print("Adding expires_at column to summaries table...")
                     conn.execute(
                         db.text("ALTER TABLE summaries ADD COLUMN expires_at DATETIME")
                     )
+                    backfill_expires_at(conn, Summary, now, ttl)
+                    print("Updated expiration dates for existing summaries")
 
                 if needs_markdown_migration:
                     print("Adding expires_at column to markdown_conversions table...")
@@ -53,55 +121,9 @@ def add_expires_at_column():
                             "ALTER TABLE markdown_conversions ADD COLUMN expires_at DATETIME"
                         )
                     )
-
-            # Update existing records with expiration dates
-            now = datetime.utcnow()
-            expires_at = now + ttl
-            cutoff_time = now - ttl
-
-            # Update existing summaries
-            if needs_summaries_migration:
-                try:
-                    # Handle old records (older than TTL)
-                    db.session.query(Summary).filter(
-                        Summary.created_at <= cutoff_time
-                    ).update({"expires_at": now}, synchronize_session=False)
-
-                    # Handle newer records
-                    db.session.query(Summary).filter(
-                        Summary.created_at > cutoff_time
-                    ).update(
-                        {"expires_at": datetime.utcnow() + ttl},
-                        synchronize_session=False,
-                    )
-
-                    print("Updated expiration dates for existing summaries")
-                except Exception as e:
-                    db.session.rollback()
-                    print(f"Error updating summaries: {e}")
-
-            # Update existing markdown conversions
-            if needs_markdown_migration:
-                try:
-                    # Handle old records (older than TTL)
-                    db.session.query(MarkdownConversion).filter(
-                        MarkdownConversion.created_at <= cutoff_time
-                    ).update({"expires_at": now}, synchronize_session=False)
-
-                    # Handle newer records
-                    db.session.query(MarkdownConversion).filter(
-                        MarkdownConversion.created_at > cutoff_time
-                    ).update(
-                        {"expires_at": datetime.utcnow() + ttl},
-                        synchronize_session=False,
-                    )
-
+                    backfill_expires_at(conn, MarkdownConversion, now, ttl)
                     print("Updated expiration dates for existing markdown conversions")
-                except Exception as e:
-                    db.session.rollback()
-                    print(f"Error updating markdown conversions: {e}")
 
-            db.session.commit()
             print("Database migration completed successfully!")
         else:
             print(
@@ -110,4 +132,6 @@ def add_expires_at_column():
 
 
 if __name__ == "__main__":
-    add_expires_at_column()
+    app = create_app()
+    add_expires_at_column(app)
+    create_missing_indexes(app)
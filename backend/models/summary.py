@@ -1,5 +1,16 @@
-from datetime import datetime
-from app import db
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.orm import column_property
+from app.extensions import db
+
+# Stored copies of request and result text are cut to this many characters
+# to prevent DB issues. Slicing a shorter string returns it without copying.
+STORED_TEXT_LIMIT = 5000
+
+
+def default_expires_at():
+    """Expiration time for a new record, based on the configured DATA_TTL"""
+    return datetime.utcnow() + current_app.config.get("DATA_TTL", timedelta(hours=1))
 
 
 class Summary(db.Model):
@@ -13,9 +24,25 @@ class Summary(db.Model):
     original_length = db.Column(db.Integer, nullable=False)
     summary_length = db.Column(db.Integer, nullable=False)
     summary_type = db.Column(db.String(20), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     # TTL field to track when record should be removed
-    expires_at = db.Column(db.DateTime, nullable=True)
+    expires_at = db.Column(
+        db.DateTime, default=default_expires_at, nullable=True, index=True
+    )
+    # Computed by the database when the row is loaded
+    reduction_percentage = column_property(
+        db.case(
+            (
+                original_length > 0,
+                db.func.round(
+                    100 - db.literal_column("100.0") * summary_length / original_length,
+                    1,
+                    type_=db.Float,
+                ),
+            ),
+            else_=0,
+        )
+    )
 
     def __init__(
         self, original_text, summary_text, original_length, summary_length, summary_type
@@ -32,11 +59,7 @@ class Summary(db.Model):
             "summary": self.summary_text,
             "original_length": self.original_length,
             "summary_length": self.summary_length,
-            "reduction_percentage": (
-                round((1 - (self.summary_length / self.original_length)) * 100, 1)
-                if self.original_length > 0
-                else 0
-            ),
+            "reduction_percentage": self.reduction_percentage,
             "created_at": self.created_at.isoformat(),
         }
 
@@ -52,9 +75,11 @@ class MarkdownConversion(db.Model):
     conversion_type = db.Column(
         db.String(20), nullable=False
     )  # 'to_markdown' or 'to_text'
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     # TTL field to track when record should be removed
-    expires_at = db.Column(db.DateTime, nullable=True)
+    expires_at = db.Column(
+        db.DateTime, default=default_expires_at, nullable=True, index=True
+    )
 
     def __init__(self, original_text, converted_text, conversion_type):
         self.original_text = original_text
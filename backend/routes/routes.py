@@ -1,112 +1,172 @@
-from flask import Blueprint, request, jsonify, current_app
-from app import db
-from datetime import datetime, timedelta
-from models.summary import Summary, MarkdownConversion
-from services.summarizer import TextSummarizer
-from services.markdown_converter import MarkdownConverter
+from flask import Blueprint, request, current_app
+from app.extensions import db
+from datetime import timedelta
+from models.summary import Summary, MarkdownConversion, STORED_TEXT_LIMIT
+from services.writer import record_writer
 from utils.text_processor import count_words
+import functools
+import orjson
+import time
 import traceback
 from flask_cors import cross_origin
 
 api_bp = Blueprint("api", __name__)
-summarizer = TextSummarizer()
-markdown_converter = MarkdownConverter()
+
+# Accepted values for the "type" and "mode" request fields
+SUMMARY_TYPES = frozenset({"concise", "detailed"})
+CONVERSION_MODES = frozenset({"to_markdown", "to_text"})
+
+
+@functools.cache
+def _get_summarizer():
+    """Build the summarizer on first use so app startup skips importing NLTK"""
+    from services.summarizer import TextSummarizer
+
+    return TextSummarizer()
+
+
+@functools.cache
+def _get_markdown_converter():
+    """Build the markdown converter on first use, importing markdown and bs4 then"""
+    from services.markdown_converter import MarkdownConverter
+
+    return MarkdownConverter()
+
+
+def _json(payload, status=200):
+    """Build a JSON response, serialized with orjson instead of the stdlib encoder"""
+    return current_app.response_class(
+        orjson.dumps(payload), status=status, mimetype="application/json"
+    )
+
+
+def _load_json():
+    """Parse the request body as a JSON object, returning None if it isn't one"""
+    # cache=False: the raw body isn't kept on the request once parsed
+    raw = request.get_data(cache=False)
+    if not raw:
+        return None
+
+    try:
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return None
+
+    return data if isinstance(data, dict) else None
+
+
+def _get_record_count(model):
+    """Return a table's row count, cached so health probes don't rescan it"""
+    max_age = current_app.config.get("DATA_CLEANUP_INTERVAL", 3600) / 10
+    now = time.monotonic()
+
+    # Kept per app, since apps in one process may use different databases;
+    # keyed by table name: (count, fetched_at)
+    record_counts = current_app.extensions.setdefault("record_counts", {})
+    cached = record_counts.get(model.__tablename__)
+    if cached is not None and now - cached[1] < max_age:
+        return cached[0]
+
+    # A bare COUNT on the primary key, without the subquery Query.count()
+    # wraps around the full entity select, and without flushing the session
+    with db.session.no_autoflush:
+        count = db.session.query(db.func.count(model.id)).scalar()
+    record_counts[model.__tablename__] = (count, now)
+    return count
+
+
+@api_bp.before_request
+def handle_preflight():
+    """Answer CORS preflight requests before any view code runs"""
+    # Flask-CORS adds the Access-Control-* headers to this response
+    if request.method == "OPTIONS":
+        return current_app.response_class(status=204)
 
 
 @api_bp.route("/summarize", methods=["POST", "OPTIONS"])
 @cross_origin()  # Add cross_origin decorator to ensure CORS headers
 def summarize_text():
     """API endpoint to summarize text with improved error handling and data expiration"""
-    # Handle preflight OPTIONS request for CORS
-    if request.method == "OPTIONS":
-        return "", 200  # Respond with 200 OK for OPTIONS requests
-
     try:
-        data = request.get_json()
+        data = _load_json()
 
         if not data:
-            return jsonify({"error": "Invalid JSON data provided"}), 400
+            return _json({"error": "Invalid JSON data provided"}, 400)
 
         if "text" not in data:
-            return jsonify({"error": "No text provided"}), 400
+            return _json({"error": "No text provided"}, 400)
 
         text = data.get("text", "")
         max_length = data.get("max_length")
         summary_type = data.get("type", "concise")
 
         if not text or not text.strip():
-            return jsonify({"error": "Empty text provided"}), 400
+            return _json({"error": "Empty text provided"}, 400)
 
         # Validate max_length if provided
         if max_length is not None:
             try:
                 max_length = int(max_length)
                 if max_length <= 0:
-                    return (
-                        jsonify({"error": "max_length must be a positive integer"}),
-                        400,
+                    return _json(
+                        {"error": "max_length must be a positive integer"}, 400
                     )
             except (ValueError, TypeError):
-                return jsonify({"error": "max_length must be a valid integer"}), 400
+                return _json({"error": "max_length must be a valid integer"}, 400)
 
-        # Validate summary_type
-        if summary_type not in ["concise", "detailed"]:
-            return (
-                jsonify({"error": "summary_type must be 'concise' or 'detailed'"}),
-                400,
-            )
+        # Validate summary_type; lists and dicts can't be looked up in a frozenset
+        if not isinstance(summary_type, str) or summary_type not in SUMMARY_TYPES:
+            return _json({"error": "summary_type must be 'concise' or 'detailed'"}, 400)
 
         # Generate summary with better error handling
         try:
-            result = summarizer.summarize(text, max_length, summary_type)
+            result = _get_summarizer().summarize(text, max_length, summary_type)
 
             if not result or "summary" not in result:
                 current_app.logger.error("Summarizer returned invalid result")
-                return jsonify({"error": "Failed to generate summary"}), 500
+                return _json({"error": "Failed to generate summary"}, 500)
 
         except Exception as e:
             current_app.logger.error(f"Summarization error: {str(e)}")
             current_app.logger.error(traceback.format_exc())
-            return jsonify({"error": f"Error generating summary: {str(e)}"}), 500
+            return _json({"error": f"Error generating summary: {str(e)}"}, 500)
+
+        # Only count words when the summarizer did not report them, since a
+        # .get() default would tokenize the text on every request
+        summary_text = result["summary"]
+        if "original_length" in result:
+            original_length = result["original_length"]
+        else:
+            original_length = count_words(text)
+        if "summary_length" in result:
+            summary_length = result["summary_length"]
+        else:
+            summary_length = count_words(summary_text)
 
         # Store in database with error handling
         try:
-            # Set expiration time based on config
-            ttl = current_app.config.get("DATA_TTL", timedelta(hours=1))
-            expires_at = datetime.utcnow() + ttl
-
-            # Create summary object
-            summary = Summary(
-                original_text=text[:5000],  # Limit size to prevent DB issues
-                summary_text=result["summary"][
-                    :5000
-                ],  # Limit size to prevent DB issues
-                original_length=result.get("original_length", count_words(text)),
-                summary_length=result.get(
-                    "summary_length", count_words(result["summary"])
-                ),
-                summary_type=summary_type,
-            )
-
-            # Set expiration
-            summary.expires_at = expires_at
-
-            # Add and commit with error handling
-            db.session.add(summary)
-            db.session.commit()
+            record = {
+                "original_text": text[:STORED_TEXT_LIMIT],
+                "summary_text": summary_text[:STORED_TEXT_LIMIT],
+                "original_length": original_length,
+                "summary_length": summary_length,
+                "summary_type": summary_type,
+            }
+
+            response = {
+                "summary": summary_text,
+                "original_length": original_length,
+                "summary_length": summary_length,
+            }
+
+            # Queue the insert for the background writer, falling back to a
+            # synchronous commit when the writer is not running or is full
+            if not record_writer.submit(Summary, record):
+                db.session.add(Summary(**record))
+                db.session.commit()
 
             # Return response
-            return (
-                jsonify(
-                    {
-                        "summary": result["summary"],
-                        "original_length": result["original_length"],
-                        "summary_length": result["summary_length"],
-                        "id": summary.id,
-                    }
-                ),
-                200,
-            )
+            return _json(response, 200)
 
         except Exception as e:
             db.session.rollback()
@@ -114,96 +174,84 @@ def summarize_text():
             current_app.logger.error(traceback.format_exc())
 
             # Still return the summary even if DB storage failed
-            return (
-                jsonify(
-                    {
-                        "summary": result["summary"],
-                        "original_length": result["original_length"],
-                        "summary_length": result["summary_length"],
-                        "warning": "Summary generated but not saved to database",
-                    }
-                ),
+            return _json(
+                {
+                    "summary": summary_text,
+                    "original_length": original_length,
+                    "summary_length": summary_length,
+                    "warning": "Summary generated but not saved to database",
+                },
                 200,
             )
 
     except Exception as e:
         current_app.logger.error(f"Unexpected error in summarize_text: {str(e)}")
         current_app.logger.error(traceback.format_exc())
-        return jsonify({"error": f"Server error: {str(e)}"}), 500
+        return _json({"error": f"Server error: {str(e)}"}, 500)
 
 
 @api_bp.route("/markdown", methods=["POST", "OPTIONS"])
 @cross_origin()  # Add cross_origin decorator
 def convert_markdown():
     """API endpoint to convert text to/from markdown with data expiration"""
-    # Handle preflight OPTIONS request for CORS
-    if request.method == "OPTIONS":
-        return "", 200  # Respond with 200 OK for OPTIONS requests
-
     try:
-        data = request.get_json()
+        data = _load_json()
 
         if not data:
-            return jsonify({"error": "Invalid JSON data provided"}), 400
+            return _json({"error": "Invalid JSON data provided"}, 400)
 
         if "text" not in data:
-            return jsonify({"error": "No text provided"}), 400
+            return _json({"error": "No text provided"}, 400)
 
         text = data.get("text", "")
         mode = data.get("mode", "to_markdown")
 
         if not text.strip():
-            return jsonify({"error": "Empty text provided"}), 400
+            return _json({"error": "Empty text provided"}, 400)
 
-        if mode not in ["to_markdown", "to_text"]:
-            return jsonify({"error": "Invalid conversion mode"}), 400
+        if not isinstance(mode, str) or mode not in CONVERSION_MODES:
+            return _json({"error": "Invalid conversion mode"}, 400)
 
         # Convert text with error handling
         try:
-            result = markdown_converter.convert(text, mode)
+            result = _get_markdown_converter().convert(text, mode)
         except Exception as e:
             current_app.logger.error(f"Markdown conversion error: {str(e)}")
-            return jsonify({"error": f"Error converting text: {str(e)}"}), 500
+            return _json({"error": f"Error converting text: {str(e)}"}, 500)
 
         # Store in database with error handling
         try:
-            # Set expiration time based on config
-            ttl = current_app.config.get("DATA_TTL", timedelta(hours=1))
-            expires_at = datetime.utcnow() + ttl
-
-            conversion = MarkdownConversion(
-                original_text=text[:5000],  # Limit size to prevent DB issues
-                converted_text=result[:5000],  # Limit size to prevent DB issues
-                conversion_type=mode,
-            )
-
-            # Set expiration
-            conversion.expires_at = expires_at
+            record = {
+                "original_text": text[:STORED_TEXT_LIMIT],
+                "converted_text": result[:STORED_TEXT_LIMIT],
+                "conversion_type": mode,
+            }
 
-            db.session.add(conversion)
-            db.session.commit()
+            # Queue the insert for the background writer, falling back to a
+            # synchronous commit when the writer is not running or is full
+            if not record_writer.submit(MarkdownConversion, record):
+                db.session.add(MarkdownConversion(**record))
+                db.session.commit()
 
-            return jsonify({"result": result}), 200
+            return _json({"result": result}, 200)
 
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(f"Database error: {str(e)}")
 
             # Still return the conversion result even if DB storage failed
-            return (
-                jsonify(
-                    {
-                        "result": result,
-                        "warning": "Conversion completed but not saved to database",
-                    }
-                ),
+            return _json(
+                {
+                    "result": result,
+                    "warning": "Conversion completed but not saved to database",
+                },
                 200,
             )
 
     except Exception as e:
         current_app.logger.error(f"Unexpected error in convert_markdown: {str(e)}")
         current_app.logger.error(traceback.format_exc())
-        return jsonify({"error": f"Server error: {str(e)}"}), 500
+        return _json({"error": f"Server error: {str(e)}"}, 500)
 
 
 @api_bp.route("/health", methods=["GET"])
@@ -212,12 +260,12 @@ def health_check():
     """Health check endpoint with DB stats"""
     try:
         # Check database connection
-        db.session.execute("SELECT 1")
+        db.session.execute(db.text("SELECT 1"))
         db_status = "connected"
 
         # Get record counts
-        summary_count = db.session.query(Summary).count()
-        conversion_count = db.session.query(MarkdownConversion).count()
+        summary_count = _get_record_count(Summary)
+        conversion_count = _get_record_count(MarkdownConversion)
 
         # Get cleanup settings
         cleanup_interval = current_app.config.get("DATA_CLEANUP_INTERVAL", 3600)
@@ -227,23 +275,21 @@ def health_check():
             / 3600
         )
 
-        return (
-            jsonify(
-                {
-                    "status": "healthy",
-                    "database": db_status,
-                    "api_version": "1.0.0",
-                    "stats": {
-                        "summary_records": summary_count,
-                        "conversion_records": conversion_count,
-                        "cleanup_interval_seconds": cleanup_interval,
-                        "max_records_per_table": max_records,
-                        "data_ttl_hours": ttl_hours,
-                    },
-                }
-            ),
+        return _json(
+            {
+                "status": "healthy",
+                "database": db_status,
+                "api_version": "1.0.0",
+                "stats": {
+                    "summary_records": summary_count,
+                    "conversion_records": conversion_count,
+                    "cleanup_interval_seconds": cleanup_interval,
+                    "max_records_per_table": max_records,
+                    "data_ttl_hours": ttl_hours,
+                },
+            },
             200,
         )
     except Exception as e:
         db_status = f"error: {str(e)}"
-        return jsonify({"status": "degraded", "database": db_status}), 500
+        return _json({"status": "degraded", "database": db_status}, 500)
@@ -1,7 +1,6 @@
 from datetime import datetime, timedelta
 import threading
-import time
-from app import db
+from app.extensions import db
 from models.summary import Summary, MarkdownConversion
 from flask import current_app
 import logging
@@ -17,6 +16,9 @@ class DataCleanupService:
         self.app = app
         self.cleanup_thread = None
         self.running = False
+        self._wakeup = threading.Event()
+        # The schema doesn't change at runtime, so it is only checked until it passes
+        self._schema_ok = False
 
         if app is not None:
             self.init_app(app)
@@ -39,10 +41,15 @@ class DataCleanupService:
     def stop(self):
         """Stop the cleanup service"""
         self.running = False
+        self._wakeup.set()
         if self.cleanup_thread is not None:
             self.cleanup_thread.join(timeout=5.0)
             logger.info("Data cleanup service stopped")
 
+    def trigger_now(self):
+        """Run a cleanup pass immediately instead of waiting for the interval"""
+        self._wakeup.set()
+
     def _cleanup_worker(self):
         """Background worker that runs the cleanup tasks"""
         with self.app.app_context():
@@ -55,8 +62,9 @@ class DataCleanupService:
                 except Exception as e:
                     logger.error(f"Error during data cleanup: {str(e)}")
 
-                # Sleep until next cleanup
-                time.sleep(cleanup_interval)
+                # Wait until next cleanup, or until stopped or triggered
+                self._wakeup.wait(cleanup_interval)
+                self._wakeup.clear()
 
     def _check_column_exists(self, table_name, column_name):
         """Check if a column exists in a table"""
@@ -69,99 +77,99 @@ class DataCleanupService:
         logger.info("Running scheduled data cleanup")
 
         # Check if expires_at column exists in the tables
-        summaries_has_expires = self._check_column_exists("summaries", "expires_at")
-        markdown_has_expires = self._check_column_exists(
-            "markdown_conversions", "expires_at"
-        )
-
-        if not summaries_has_expires or not markdown_has_expires:
-            logger.warning(
-                "Database tables missing expires_at column. Skipping cleanup operation."
+        if not self._schema_ok:
+            summaries_has_expires = self._check_column_exists("summaries", "expires_at")
+            markdown_has_expires = self._check_column_exists(
+                "markdown_conversions", "expires_at"
             )
-            return
+
+            if not summaries_has_expires or not markdown_has_expires:
+                logger.warning(
+                    "Database tables missing expires_at column. Skipping cleanup operation."
+                )
+                return
+
+            self._schema_ok = True
 
         # Get config values
-        ttl = self.app.config["DATA_TTL"]
         max_records = self.app.config["MAX_RECORDS_PER_TABLE"]
+        batch_size = self.app.config["DATA_CLEANUP_BATCH_SIZE"]
 
         # Set current time for consistent comparisons
         now = datetime.utcnow()
-        cutoff_time = now - ttl
 
-        with db.session.begin():
-            try:
-                # Update expired_at for records that don't have it set
-                self._update_expiration_dates(Summary, cutoff_time, now)
-                self._update_expiration_dates(MarkdownConversion, cutoff_time, now)
+        try:
+            # Delete expired records
+            summary_deleted = self._delete_expired(Summary, now, batch_size)
+            markdown_deleted = self._delete_expired(MarkdownConversion, now, batch_size)
 
-                # Delete expired records
-                summary_deleted = (
-                    db.session.query(Summary).filter(Summary.expires_at <= now).delete()
+            # Enforce maximum records limit by removing oldest records if needed
+            excess = self._trim_to_limit(Summary, max_records)
+            if excess:
+                logger.info(
+                    f"Removed {excess} oldest summary records to maintain limit"
                 )
 
-                markdown_deleted = (
-                    db.session.query(MarkdownConversion)
-                    .filter(MarkdownConversion.expires_at <= now)
-                    .delete()
+            excess = self._trim_to_limit(MarkdownConversion, max_records)
+            if excess:
+                logger.info(
+                    f"Removed {excess} oldest markdown conversion records to maintain limit"
                 )
 
-                # Enforce maximum records limit by removing oldest records if needed
-                summary_count = db.session.query(Summary).count()
-                if summary_count > max_records:
-                    excess = summary_count - max_records
-                    oldest_summaries = (
-                        db.session.query(Summary)
-                        .order_by(Summary.created_at)
-                        .limit(excess)
-                        .all()
-                    )
-
-                    for record in oldest_summaries:
-                        db.session.delete(record)
-
-                    logger.info(
-                        f"Removed {excess} oldest summary records to maintain limit"
-                    )
-
-                markdown_count = db.session.query(MarkdownConversion).count()
-                if markdown_count > max_records:
-                    excess = markdown_count - max_records
-                    oldest_conversions = (
-                        db.session.query(MarkdownConversion)
-                        .order_by(MarkdownConversion.created_at)
-                        .limit(excess)
-                        .all()
-                    )
-
-                    for record in oldest_conversions:
-                        db.session.delete(record)
-
-                    logger.info(
-                        f"Removed {excess} oldest markdown conversion records to maintain limit"
-                    )
+            db.session.commit()
 
-                logger.info(
-                    f"Cleanup completed. Deleted {summary_deleted} summary records and "
-                    f"{markdown_deleted} markdown conversion records based on TTL."
-                )
+            logger.info(
+                f"Cleanup completed. Deleted {summary_deleted} summary records and "
+                f"{markdown_deleted} markdown conversion records based on TTL."
+            )
+
+        except Exception as e:
+            logger.error(f"Error during database cleanup: {str(e)}")
+            db.session.rollback()
+            raise
+
+    def _delete_expired(self, model, now, batch_size):
+        """Delete expired records in batches, committing after each one"""
+        deleted = 0
+
+        # Short transactions keep write locks brief on a large backlog, and
+        # committed batches stay deleted if a later one fails
+        while True:
+            expired_ids = (
+                db.session.query(model.id)
+                .filter(model.expires_at <= now)
+                .limit(batch_size)
+                .subquery()
+            )
+            is_expired = model.id.in_(sa.select(expired_ids.c.id))
+            count = (
+                db.session.query(model)
+                .filter(is_expired)
+                .delete(synchronize_session=False)
+            )
+            db.session.commit()
+
+            deleted += count
+            if count < batch_size:
+                return deleted
+
+    def _trim_to_limit(self, model, max_records):
+        """Delete every record older than the newest max_records in one statement"""
+        # No count is needed first: the DELETE is a no-op when under the limit.
+        # Selecting from the id subquery keeps LIMIT out of the IN clause for
+        # databases that don't allow it there.
+        newest_ids = (
+            sa.select(model.id)
+            .order_by(model.created_at.desc())
+            .limit(max_records)
+            .subquery()
+        )
+        result = db.session.execute(
+            sa.delete(model).where(model.id.not_in(sa.select(newest_ids.c.id))),
+            execution_options={"synchronize_session": False},
+        )
 
-            except Exception as e:
-                logger.error(f"Error during database cleanup: {str(e)}")
-                db.session.rollback()
-                raise
-
-    def _update_expiration_dates(self, model, cutoff_time, now):
-        """Update expiration dates for records that don't have them set"""
-        # Update old records that should already be expired
-        db.session.query(model).filter(
-            model.created_at <= cutoff_time, model.expires_at.is_(None)
-        ).update({"expires_at": now}, synchronize_session=False)
-
-        # Set expiration dates for newer records without them
-        ttl = self.app.config["DATA_TTL"]
-        db.session.query(model).filter(
-            model.created_at > cutoff_time, model.expires_at.is_(None)
-        ).update({"expires_at": model.created_at + ttl}, synchronize_session=False)
+        return result.rowcount
 
 
 # Singleton instance
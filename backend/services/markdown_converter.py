@@ -1,14 +1,191 @@
 import re
 import html
+import functools
+import threading
+import time
+from collections import OrderedDict
 import markdown
 from bs4 import BeautifulSoup
 
+# Keywords that each add a point to a paragraph's code score
+_PROGRAMMING_KEYWORDS = frozenset(
+    {
+        "return",
+        "print",
+        "var",
+        "let",
+        "const",
+        "async",
+        "await",
+        "public",
+        "private",
+        "static",
+        "void",
+        "int",
+        "float",
+        "string",
+        "bool",
+        "True",
+        "False",
+        "None",
+        "null",
+        "undefined",
+        "this",
+        "self",
+        "lambda",
+        "map",
+        "filter",
+        "reduce",
+    }
+)
+
+# Paragraph structure
+_PARAGRAPH_SPLIT_RE = re.compile(r"\n\s*\n")
+_BULLET_RE = re.compile(r"^\s*[-*]\s")
+_NUMBERED_RE = re.compile(r"^\s*\d+[.)]\s")
+_HEADING_END_PUNCT = (".", ",", ":", ";")
+_HEADING_END_WORD_RE = re.compile(r"\b(?:and|or|but|that|with|from|by|as|on)$")
+
+# Code block scoring
+_CODE_CONSTRUCTS_RE = re.compile(
+    r"\b(def|class|function|if|for|while|try|except|import|from)\b"
+)
+_ASSIGNMENT_RE = re.compile(r"[a-zA-Z_][a-zA-Z0-9_]*\s*=\s*")
+_CODE_PUNCT_RE = re.compile(r"[{}\[\]();]")
+_INDENT_RE = re.compile(r"^\s{2,}")
+_CODE_KEYWORDS_RE = re.compile(
+    r"\b(?:" + "|".join(sorted(_PROGRAMMING_KEYWORDS, key=len, reverse=True)) + r")\b"
+)
+_COMMENT_RE = re.compile(r"^\s*(#|//|/\*|\*)", re.MULTILINE)
+_METHOD_CALL_RE = re.compile(r"[a-zA-Z_][a-zA-Z0-9_]*\.[a-zA-Z_][a-zA-Z0-9_]*\s*\(")
+
+# Language detection
+_PY_KEYWORDS_RE = re.compile(r"\b(def|class|import|from|if __name__|print)\b")
+_PY_BLOCK_END_RE = re.compile(r":\s*$", re.MULTILINE)
+_JS_KEYWORDS_RE = re.compile(r"\b(function|const|let|var|export|import from|=>)\b")
+_STATEMENT_END_RE = re.compile(r";\s*$", re.MULTILINE)
+_TS_TYPES_RE = re.compile(r"\b(interface|type|<T>|:string|:number|:boolean)\b")
+_HTML_PAIR_RE = re.compile(r"<[a-zA-Z]+[^>]*>.*?</[a-zA-Z]+>", re.DOTALL)
+_HTML_SELF_CLOSING_RE = re.compile(r"<[a-zA-Z]+[^>]*/>")
+_CSS_RULE_RE = re.compile(r"[a-zA-Z-]+\s*{\s*[a-zA-Z-]+\s*:\s*[^;]+;\s*}", re.DOTALL)
+_JAVA_KEYWORDS_RE = re.compile(r"\b(public|private|class|static|void)\b")
+_BRACE_END_RE = re.compile(r"{\s*$", re.MULTILINE)
+_JAVA_MARKERS_RE = re.compile(r"\b(System\.out\.println|String\[\]|args)\b")
+_CSHARP_MARKERS_RE = re.compile(r"\b(Console|WriteLine|namespace|using System)\b")
+_C_MARKERS_RE = re.compile(r"\b(include|printf|scanf|malloc|int main|void main)\b")
+_CPP_MARKERS_RE = re.compile(r"\b(std::|cout|cin|vector|string)\b")
+_SQL_KEYWORDS_RE = re.compile(
+    r"\b(SELECT|INSERT|UPDATE|DELETE|FROM|WHERE|JOIN)\b", re.IGNORECASE
+)
+_SHELL_COMMANDS_RE = re.compile(r"\b(chmod|chown|sudo|apt|yum|brew)\b")
+
+# Formatting enhancements
+_BOLD_RE = re.compile(r"(?<!\*)\*([^*\n]+)\*(?!\*)")
+_ITALIC_RE = re.compile(r"(?<!_)_([^_\n]+)_(?!_)")
+_URL_RE = re.compile(r"(https?://[^\s]+)")
+# Opening and closing tags never overlap, so one pass handles both
+_HTML_TAG_RE = re.compile(r"<(\w+)[^>]*>|</(\w+)>")
+
+# Markdown instances keep per-document state, so calls to the shared parser
+# are serialized and reset first
+_MD_LOCK = threading.Lock()
+
+# Plain text rendering: newlines placed before and after block elements
+_BLOCK_SPACING = {
+    "h1": ("\n\n", "\n"),
+    "h2": ("\n\n", "\n"),
+    "h3": ("\n\n", "\n"),
+    "h4": ("\n\n", "\n"),
+    "h5": ("\n\n", "\n"),
+    "h6": ("\n\n", "\n"),
+    "p": ("\n", "\n"),
+    "div": ("\n", "\n"),
+    "pre": ("\n", "\n"),
+}
+_TEXT_FORMAT_TAGS = [*_BLOCK_SPACING, "li", "code", "a"]
+_EXCESS_NEWLINES_RE = re.compile(r"\n{3,}")
+
+# Conversions are pure functions of their input, so repeated inputs are
+# served from a cache. Each cache holds at most CONVERSION_CACHE_MAX_CHARS of
+# input plus output text, drops entries after CONVERSION_CACHE_MAX_AGE seconds
+# (well within any DATA_TTL, so user text isn't kept past its database copy),
+# and longer inputs bypass it entirely.
+CONVERSION_CACHE_MAX_CHARS = 2_000_000
+CONVERSION_CACHE_MAX_AGE = 300
+MAX_CACHED_INPUT_LENGTH = 4000
+
+
+@functools.cache
+def _get_md():
+    """Shared markdown parser, built on first use rather than at import"""
+    return markdown.Markdown(extensions=["tables", "fenced_code"])
+
+
+class _ConversionCache:
+    """Thread-safe LRU cache of conversions, bounded by total characters and age"""
+
+    def __init__(self, max_chars, max_age):
+        self.max_chars = max_chars
+        self.max_age = max_age
+        self._entries = OrderedDict()  # input -> (result, stored at)
+        self._chars = 0
+        self._lock = threading.Lock()
+
+    def get(self, text):
+        """Cached result for text, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(text)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[1] > self.max_age:
+                self._remove(text)
+                return None
+            self._entries.move_to_end(text)
+            return entry[0]
+
+    def put(self, text, result):
+        """Store a result, evicting the least recently used entries to fit"""
+        with self._lock:
+            if text in self._entries:
+                self._remove(text)
+            self._entries[text] = (result, time.monotonic())
+            self._chars += len(text) + len(result)
+            while self._chars > self.max_chars:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, text):
+        result, _ = self._entries.pop(text)
+        self._chars -= len(text) + len(result)
+
+
+def _backtick_tag(match):
+    """Replacement for _HTML_TAG_RE: the bare tag wrapped in backticks"""
+    if match.group(1) is not None:
+        return f"`<{match.group(1)}>`"
+    return f"`</{match.group(2)}>`"
+
 
 class MarkdownConverter:
     """Class that provides markdown conversion functionality with improved code block detection"""
 
     def __init__(self):
-        self.md = markdown.Markdown(extensions=["tables", "fenced_code"])
+        self._markdown_cache = _ConversionCache(
+            CONVERSION_CACHE_MAX_CHARS, CONVERSION_CACHE_MAX_AGE
+        )
+        self._text_cache = _ConversionCache(
+            CONVERSION_CACHE_MAX_CHARS, CONVERSION_CACHE_MAX_AGE
+        )
+
+    @staticmethod
+    def _convert_cached(cache, convert, text):
+        """Run convert on text through cache, bypassing it for long inputs"""
+        if len(text) >= MAX_CACHED_INPUT_LENGTH:
+            return convert(text)
+        result = cache.get(text)
+        if result is None:
+            result = convert(text)
+            cache.put(text, result)
+        return result
 
     def to_markdown(self, text):
         """
@@ -20,32 +197,37 @@ class MarkdownConverter:
         Returns:
             str: Markdown formatted text
         """
+        return self._convert_cached(self._markdown_cache, self._to_markdown, text)
+
+    def _to_markdown(self, text):
+        """Uncached implementation of to_markdown"""
         # Clean the text
         text = text.strip()
 
         # Process paragraphs - each line break becomes a new paragraph
-        paragraphs = re.split(r"\n\s*\n", text)
+        paragraphs = _PARAGRAPH_SPLIT_RE.split(text)
         result = []
 
         # Process each paragraph
         for para in paragraphs:
             lines = para.strip().split("\n")
+            # Strip each line once for the list checks and heading pass
+            stripped_lines = [line.strip() for line in lines]
+            features = self._scan_lines(lines, stripped_lines)
 
             # Check if this is a code block using improved detection
-            if self._is_code_block(para, lines):
+            if self._is_code_block(para, lines, features):
                 code_lang = self._detect_language(para, lines)
                 formatted_para = f"```{code_lang}\n{para}\n```"
                 result.append(formatted_para)
 
             # Check for bulleted lists (lines starting with - or *)
-            elif all(re.match(r"^\s*[-*]\s", line) for line in lines if line.strip()):
+            elif features["all_bullets"]:
                 # It's a bulleted list, keep as is
                 result.append(para)
 
             # Check for numbered lists (lines starting with numbers)
-            elif all(
-                re.match(r"^\s*\d+[.)]\s", line) for line in lines if line.strip()
-            ):
+            elif features["all_numbered"]:
                 # It's a numbered list, keep as is
                 result.append(para)
 
@@ -53,9 +235,7 @@ class MarkdownConverter:
             else:
                 # Process headings - look for lines that could be headings
                 processed_lines = []
-                for line in lines:
-                    line = line.strip()
-
+                for line in stripped_lines:
                     # Empty line
                     if not line:
                         processed_lines.append("")
@@ -64,10 +244,8 @@ class MarkdownConverter:
                     # Check if it looks like a heading (short line, no ending punctuation)
                     if (
                         len(line) < 60
-                        and not re.search(r"[.,:;]$", line)
-                        and not re.search(
-                            r"\b(and|or|but|that|with|from|by|as|on)\b$", line.lower()
-                        )
+                        and not line.endswith(_HEADING_END_PUNCT)
+                        and not _HEADING_END_WORD_RE.search(line.lower())
                     ):
                         # Looks like a heading - determine level based on importance
                         if len(processed_lines) == 0:  # First line is a title
@@ -87,90 +265,107 @@ class MarkdownConverter:
 
         return markdown_text
 
-    def _is_code_block(self, text, lines):
+    def _scan_lines(self, lines, stripped_lines):
+        """
+        Collect the line-level features of a paragraph in a single pass
+
+        Args:
+            lines (list): Lines of the paragraph
+            stripped_lines (list): The same lines with whitespace stripped
+
+        Returns:
+            dict: Flags used by the list and code block checks
+        """
+        all_bullets = True
+        all_numbered = True
+        has_indent = False
+        has_equals = False
+        has_dot = False
+
+        for line, stripped in zip(lines, stripped_lines):
+            # Blank lines don't break a list
+            if stripped:
+                all_bullets = all_bullets and bool(_BULLET_RE.match(line))
+                all_numbered = all_numbered and bool(_NUMBERED_RE.match(line))
+            has_indent = has_indent or bool(_INDENT_RE.match(line))
+            has_equals = has_equals or "=" in line
+            has_dot = has_dot or "." in line
+
+        return {
+            "all_bullets": all_bullets,
+            "all_numbered": all_numbered,
+            "has_indent": has_indent,
+            "has_equals": has_equals,
+            "has_dot": has_dot,
+        }
+
+    def _is_code_block(self, text, lines, features):
         """
         Enhanced code block detection with machine learning-inspired rules
 
         Args:
             text (str): Text to check
             lines (list): Lines of the text
+            features (dict): Line-level flags from _scan_lines
 
         Returns:
             bool: True if the text is a code block
         """
-        # Code pattern indicators with point scoring system
-        score = 0
+        # Code pattern indicators with point scoring system. Every check only
+        # adds points, so the result is known as soon as the threshold is hit;
+        # precomputed line flags and strong signals are checked first.
 
         # Check for common programming language constructs
-        if re.search(
-            r"\b(def|class|function|if|for|while|try|except|import|from)\b", text
-        ):
-            score += 5
+        if _CODE_CONSTRUCTS_RE.search(text):
+            return True
 
-        # Check for variable assignments
-        if re.search(r"[a-zA-Z_][a-zA-Z0-9_]*\s*=\s*", text):
+        score = 0
+
+        # Check for indentation patterns (spaces at the beginning of lines)
+        if features["has_indent"]:
             score += 3
 
-        # Check for programming language punctuation patterns
-        if re.search(r"[{}\[\]();]", text):
+        # Check for common design patterns in code
+        # Example: queue = deque() followed by queue.append()
+        if len(lines) >= 2 and features["has_equals"] and features["has_dot"]:
             score += 2
+        if score >= 5:
+            return True
 
-        # Check for indentation patterns (spaces at the beginning of lines)
-        if any(re.match(r"^\s{2,}", line) for line in lines):
-            score += 3
+        # Check for method calls
+        if _METHOD_CALL_RE.search(text):
+            score += 4
+            if score >= 5:
+                return True
 
-        # Check for programming keywords
-        programming_keywords = [
-            "return",
-            "print",
-            "var",
-            "let",
-            "const",
-            "async",
-            "await",
-            "public",
-            "private",
-            "static",
-            "void",
-            "int",
-            "float",
-            "string",
-            "bool",
-            "True",
-            "False",
-            "None",
-            "null",
-            "undefined",
-            "this",
-            "self",
-            "lambda",
-            "map",
-            "filter",
-            "reduce",
-        ]
-        for keyword in programming_keywords:
-            if re.search(r"\b" + re.escape(keyword) + r"\b", text):
-                score += 1
+        # Check for variable assignments
+        if _ASSIGNMENT_RE.search(text):
+            score += 3
+            if score >= 5:
+                return True
 
         # Check for code comments
-        if re.search(r"^\s*(#|//|/\*|\*)", text, re.MULTILINE):
+        if _COMMENT_RE.search(text):
             score += 3
+            if score >= 5:
+                return True
 
-        # Check for method calls
-        if re.search(r"[a-zA-Z_][a-zA-Z0-9_]*\.[a-zA-Z_][a-zA-Z0-9_]*\s*\(", text):
-            score += 4
-
-        # Check for common design patterns in code
-        # Example: queue = deque() followed by queue.append()
-        if (
-            len(lines) >= 2
-            and any("=" in line for line in lines)
-            and any("." in line for line in lines)
-        ):
+        # Check for programming language punctuation patterns
+        if _CODE_PUNCT_RE.search(text):
             score += 2
+            if score >= 5:
+                return True
+
+        # Check for programming keywords, one point per distinct keyword
+        # Stop scanning as soon as enough distinct keywords have been seen
+        seen = set()
+        for match in _CODE_KEYWORDS_RE.finditer(text):
+            seen.add(match.group())
+            if score + len(seen) >= 5:
+                return True
 
-        # Make final determination based on score
-        return score >= 5
+        # The score never reached the threshold
+        return False
 
     def _detect_language(self, text, lines):
         """
@@ -184,55 +379,45 @@ class MarkdownConverter:
             str: Language identifier for markdown
         """
         # Python indicators
-        if re.search(
-            r"\b(def|class|import|from|if __name__|print)\b", text
-        ) or re.search(r":\s*$", text, re.MULTILINE):
+        if _PY_KEYWORDS_RE.search(text) or _PY_BLOCK_END_RE.search(text):
             return "py"
 
         # JavaScript/TypeScript indicators
-        if re.search(
-            r"\b(function|const|let|var|export|import from|=>)\b", text
-        ) or re.search(r";\s*$", text, re.MULTILINE):
-            if re.search(r"\b(interface|type|<T>|:string|:number|:boolean)\b", text):
+        if _JS_KEYWORDS_RE.search(text) or _STATEMENT_END_RE.search(text):
+            if _TS_TYPES_RE.search(text):
                 return "ts"
             return "js"
 
         # HTML indicators
-        if re.search(r"<[a-zA-Z]+[^>]*>.*?</[a-zA-Z]+>", text, re.DOTALL) or re.search(
-            r"<[a-zA-Z]+[^>]*/>", text
-        ):
+        if _HTML_PAIR_RE.search(text) or _HTML_SELF_CLOSING_RE.search(text):
             return "html"
 
         # CSS indicators
-        if re.search(r"[a-zA-Z-]+\s*{\s*[a-zA-Z-]+\s*:\s*[^;]+;\s*}", text, re.DOTALL):
+        if _CSS_RULE_RE.search(text):
             return "css"
 
         # Java/C# indicators
-        if re.search(r"\b(public|private|class|static|void)\b", text) and re.search(
-            r"{\s*$", text, re.MULTILINE
-        ):
-            if re.search(r"\b(System\.out\.println|String\[\]|args)\b", text):
+        if _JAVA_KEYWORDS_RE.search(text) and _BRACE_END_RE.search(text):
+            if _JAVA_MARKERS_RE.search(text):
                 return "java"
-            if re.search(r"\b(Console|WriteLine|namespace|using System)\b", text):
+            if _CSHARP_MARKERS_RE.search(text):
                 return "csharp"
 
         # C/C++ indicators
-        if re.search(r"\b(include|printf|scanf|malloc|int main|void main)\b", text):
-            if re.search(r"\b(std::|cout|cin|vector|string)\b", text):
+        if _C_MARKERS_RE.search(text):
+            if _CPP_MARKERS_RE.search(text):
                 return "cpp"
             return "c"
 
         # SQL indicators
-        if re.search(
-            r"\b(SELECT|INSERT|UPDATE|DELETE|FROM|WHERE|JOIN)\b", text, re.IGNORECASE
-        ):
+        if _SQL_KEYWORDS_RE.search(text):
             return "sql"
 
         # Shell/Bash indicators
         if (
             text.startswith("$")
             or text.startswith("#!")
-            or re.search(r"\b(chmod|chown|sudo|apt|yum|brew)\b", text)
+            or _SHELL_COMMANDS_RE.search(text)
         ):
             return "bash"
 
@@ -249,19 +434,22 @@ class MarkdownConverter:
         Returns:
             str: Enhanced markdown text
         """
-        # Emphasize important phrases (text between * or _)
-        markdown_text = re.sub(r"(?<!\*)\*([^*\n]+)\*(?!\*)", r"**\1**", markdown_text)
-        markdown_text = re.sub(r"(?<!_)_([^_\n]+)_(?!_)", r"*\1*", markdown_text)
+        # Each pass reads the previous one's output, so they stay separate and
+        # in order; passes with nothing to match are skipped without a scan
 
-        # Add code formatting for technical terms
-        markdown_text = re.sub(r"`([^`\n]+)`", r"`\1`", markdown_text)
+        # Emphasize important phrases (text between * or _)
+        if "*" in markdown_text:
+            markdown_text = _BOLD_RE.sub(r"**\1**", markdown_text)
+        if "_" in markdown_text:
+            markdown_text = _ITALIC_RE.sub(r"*\1*", markdown_text)
 
         # Format URLs
-        markdown_text = re.sub(r"(https?://[^\s]+)", r"[\1](\1)", markdown_text)
+        if "://" in markdown_text:
+            markdown_text = _URL_RE.sub(r"[\1](\1)", markdown_text)
 
         # Fix any HTML tags to use single backticks
-        markdown_text = re.sub(r"<(\w+)[^>]*>", r"`<\1>`", markdown_text)
-        markdown_text = re.sub(r"</(\w+)>", r"`</\1>`", markdown_text)
+        if "<" in markdown_text:
+            markdown_text = _HTML_TAG_RE.sub(_backtick_tag, markdown_text)
 
         return markdown_text
 
@@ -275,54 +463,55 @@ class MarkdownConverter:
         Returns:
             str: Plain text
         """
-        # Convert markdown to HTML
-        html_content = self.md.convert(markdown_text)
+        return self._convert_cached(self._text_cache, self._to_text, markdown_text)
+
+    def _to_text(self, markdown_text):
+        """Uncached implementation of to_text"""
+        # Convert markdown to HTML, resetting state left by the previous call
+        with _MD_LOCK:
+            md = _get_md()
+            md.reset()
+            html_content = md.convert(markdown_text)
 
         # Use BeautifulSoup to extract text from HTML
         soup = BeautifulSoup(html_content, "html.parser")
 
-        # Process different HTML elements
-        for tag in soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"]):
-            # Format headings with newlines
-            tag.insert_before("\n\n")
-            tag.insert_after("\n")
-
-        for tag in soup.find_all(["p", "div"]):
-            # Format paragraphs with newlines
-            tag.insert_before("\n")
-            tag.insert_after("\n")
-
-        for tag in soup.find_all("li"):
-            # Format list items
-            if tag.parent.name == "ol":
-                # Numbered list
-                index = 1
-                for i, li in enumerate(tag.parent.find_all("li")):
-                    if li == tag:
-                        index = i + 1
-                        break
-                tag.insert_before(f"{index}. ")
-            else:
-                # Bulleted list
-                tag.insert_before("- ")
-            tag.insert_after("\n")
-
-        for tag in soup.find_all("pre"):
-            # Format code blocks
-            tag.insert_before("\n")
-            tag.insert_after("\n")
-
-        for tag in soup.find_all("code"):
-            # Inline code - preserve backticks
-            if tag.parent.name == "pre":
-                # This is a code block, preserve formatting
-                pass
+        # Process all formatted elements in a single pass over the tree
+        links = []
+        # Items numbered so far in each ordered list, keyed by the <ol> tag
+        list_counts = {}
+        for tag in soup.find_all(_TEXT_FORMAT_TAGS):
+            name = tag.name
+
+            if name in _BLOCK_SPACING:
+                # Headings, paragraphs and code blocks get surrounding newlines
+                before, after = _BLOCK_SPACING[name]
+                tag.insert_before(before)
+                tag.insert_after(after)
+
+            elif name == "li":
+                # Format list items
+                if tag.parent.name == "ol":
+                    # Numbered list, items are visited in document order
+                    index = list_counts.get(id(tag.parent), 0) + 1
+                    list_counts[id(tag.parent)] = index
+                    tag.insert_before(f"{index}. ")
+                else:
+                    # Bulleted list
+                    tag.insert_before("- ")
+                tag.insert_after("\n")
+
+            elif name == "code":
+                # Inline code - preserve backticks, code blocks keep their formatting
+                if tag.parent.name != "pre":
+                    tag.insert_before("`")
+                    tag.insert_after("`")
+
             else:
-                # Inline code
-                tag.insert_before("`")
-                tag.insert_after("`")
+                # Links are rewritten once inline code inside them is wrapped
+                links.append(tag)
 
-        for tag in soup.find_all("a"):
+        for tag in links:
             # Links - show URL in parentheses after the text
             if tag.string and tag.get("href"):
                 tag.string.replace_with(f"{tag.string} ({tag.get('href')})")
@@ -331,7 +520,7 @@ class MarkdownConverter:
         text = soup.get_text()
 
         # Remove excessive newlines
-        text = re.sub(r"\n{3,}", "\n\n", text)
+        text = _EXCESS_NEWLINES_RE.sub("\n\n", text)
 
         # Unescape HTML entities
         text = html.unescape(text)
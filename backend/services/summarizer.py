@@ -1,142 +1,194 @@
 import re
+import functools
 from nltk.corpus import stopwords
 from nltk.tokenize import sent_tokenize, word_tokenize
-from nltk.probability import FreqDist
-from collections import defaultdict
-from heapq import nlargest
+from collections import Counter
+from itertools import chain, repeat, takewhile
 from utils.text_processor import count_words, clean_text
 
+# Basic set of common English stopwords, used when the NLTK corpus is missing
+_FALLBACK_STOP_WORDS = frozenset(
+    {
+        "a",
+        "an",
+        "the",
+        "and",
+        "but",
+        "if",
+        "or",
+        "because",
+        "as",
+        "until",
+        "while",
+        "of",
+        "at",
+        "by",
+        "for",
+        "with",
+        "about",
+        "against",
+        "between",
+        "into",
+        "through",
+        "during",
+        "before",
+        "after",
+        "above",
+        "below",
+        "to",
+        "from",
+        "up",
+        "down",
+        "in",
+        "out",
+        "on",
+        "off",
+        "over",
+        "under",
+        "again",
+        "further",
+        "then",
+        "once",
+        "here",
+        "there",
+        "when",
+        "where",
+        "why",
+        "how",
+        "all",
+        "any",
+        "both",
+        "each",
+        "few",
+        "more",
+        "most",
+        "other",
+        "some",
+        "such",
+        "no",
+        "nor",
+        "not",
+        "only",
+        "own",
+        "same",
+        "so",
+        "than",
+        "too",
+        "very",
+        "s",
+        "t",
+        "can",
+        "will",
+        "just",
+        "don",
+        "don't",
+        "should",
+        "now",
+        "d",
+        "ll",
+        "m",
+        "o",
+        "re",
+        "ve",
+        "y",
+        "ain",
+        "aren",
+        "aren't",
+        "couldn",
+        "couldn't",
+        "didn",
+        "didn't",
+        "doesn",
+        "doesn't",
+        "hadn",
+        "hadn't",
+        "hasn",
+        "hasn't",
+        "haven",
+        "haven't",
+        "isn",
+        "isn't",
+        "ma",
+        "mightn",
+        "mightn't",
+        "mustn",
+        "mustn't",
+        "needn",
+        "needn't",
+        "shan",
+        "shan't",
+        "shouldn",
+        "shouldn't",
+        "wasn",
+        "wasn't",
+        "weren",
+        "weren't",
+        "won",
+        "won't",
+        "wouldn",
+        "wouldn't",
+    }
+)
+
+
+# Sentence boundaries for the fallback splitter
+_SENT_SPLIT_RE = re.compile(r"[.!?]+")
+
+
+def _split_sentences(text):
+    """Split text on sentence punctuation, dropping empty pieces"""
+    pieces = (piece.strip() for piece in _SENT_SPLIT_RE.split(text))
+    return [piece for piece in pieces if piece]
+
+
+@functools.cache
+def _load_stop_words():
+    """Load the English stopwords once per process"""
+    # Try to get stopwords, with fallback if not available
+    try:
+        return frozenset(stopwords.words("english"))
+    except Exception as e:
+        print(f"Warning: Could not load stopwords: {e}")
+        return _FALLBACK_STOP_WORDS
+
 
 class TextSummarizer:
     """Class that provides text summarization functionality with improved error handling"""
 
     def __init__(self):
-        # Try to get stopwords, with fallback if not available
-        try:
-            self.stop_words = set(stopwords.words("english"))
-        except Exception as e:
-            print(f"Warning: Could not load stopwords: {e}")
-            # Fallback to a basic set of common English stopwords
-            self.stop_words = {
-                "a",
-                "an",
-                "the",
-                "and",
-                "but",
-                "if",
-                "or",
-                "because",
-                "as",
-                "until",
-                "while",
-                "of",
-                "at",
-                "by",
-                "for",
-                "with",
-                "about",
-                "against",
-                "between",
-                "into",
-                "through",
-                "during",
-                "before",
-                "after",
-                "above",
-                "below",
-                "to",
-                "from",
-                "up",
-                "down",
-                "in",
-                "out",
-                "on",
-                "off",
-                "over",
-                "under",
-                "again",
-                "further",
-                "then",
-                "once",
-                "here",
-                "there",
-                "when",
-                "where",
-                "why",
-                "how",
-                "all",
-                "any",
-                "both",
-                "each",
-                "few",
-                "more",
-                "most",
-                "other",
-                "some",
-                "such",
-                "no",
-                "nor",
-                "not",
-                "only",
-                "own",
-                "same",
-                "so",
-                "than",
-                "too",
-                "very",
-                "s",
-                "t",
-                "can",
-                "will",
-                "just",
-                "don",
-                "don't",
-                "should",
-                "now",
-                "d",
-                "ll",
-                "m",
-                "o",
-                "re",
-                "ve",
-                "y",
-                "ain",
-                "aren",
-                "aren't",
-                "couldn",
-                "couldn't",
-                "didn",
-                "didn't",
-                "doesn",
-                "doesn't",
-                "hadn",
-                "hadn't",
-                "hasn",
-                "hasn't",
-                "haven",
-                "haven't",
-                "isn",
-                "isn't",
-                "ma",
-                "mightn",
-                "mightn't",
-                "mustn",
-                "mustn't",
-                "needn",
-                "needn't",
-                "shan",
-                "shan't",
-                "shouldn",
-                "shouldn't",
-                "wasn",
-                "wasn't",
-                "weren",
-                "weren't",
-                "won",
-                "won't",
-                "wouldn",
-                "wouldn't",
-            }
+        self.stop_words = _load_stop_words()
+        # Per summary type settings: the position decay and how max_length is
+        # derived from the original word count (frac of it, kept within
+        # floor..cap, or default if counting fails). Any type other than
+        # 'concise' gets a detailed summary.
+        self._cfg = {
+            "concise": dict(decay=0.95, frac=0.3, floor=30, cap=200, default=100),
+            "detailed": dict(decay=0.98, frac=0.6, floor=50, cap=500, default=200),
+        }
+        # decay -> position weights for the longest text so far, capped where
+        # decay**i underflows to 0.0 (about 14.5k sentences at 0.95, 37k at
+        # 0.98); keyed by decay so unknown summary types share the detailed
+        # weights
+        self._decay_cache = {}
+
+    def _settings(self, summary_type):
+        """Settings for the given summary type"""
+        return self._cfg.get(summary_type) or self._cfg["detailed"]
+
+    def _position_weights(self, summary_type, n):
+        """Position weights for n sentences, cached per type"""
+        decay = self._settings(summary_type)["decay"]
+        weights = self._decay_cache.get(decay, [])
+        if len(weights) < n:
+            # Extended only up to n, and never past the first weight that
+            # underflows. Replaced rather than extended in place, since
+            # request threads share this summarizer.
+            more = list(takewhile(bool, (decay**i for i in range(len(weights), n))))
+            if more:
+                weights = weights + more
+                self._decay_cache[decay] = weights
+        # Every later weight would underflow to 0.0 anyway
+        return chain(weights, repeat(0.0))
 
     def summarize(self, text, max_length=None, summary_type="concise"):
         """
@@ -169,12 +221,18 @@ class TextSummarizer:
                 print(f"Warning: Error during text cleaning: {e}")
                 cleaned_text = text  # Fallback to original text
 
-            # Handle very short texts
+            # Handle very short texts before any tokenization
             if len(cleaned_text.strip()) < 100:
+                # Already-clean input is returned as is, so count it once
+                original_length = count_words(text)
                 return {
                     "summary": cleaned_text,
-                    "original_length": count_words(text),
-                    "summary_length": count_words(cleaned_text),
+                    "original_length": original_length,
+                    "summary_length": (
+                        original_length
+                        if cleaned_text == text
+                        else count_words(cleaned_text)
+                    ),
                 }
 
             # Tokenize the text into sentences with error handling
@@ -182,17 +240,11 @@ class TextSummarizer:
                 sentences = sent_tokenize(cleaned_text)
                 if not sentences:
                     # If tokenization fails, fallback to simple splitting
-                    sentences = [
-                        s.strip()
-                        for s in re.split(r"[.!?]+", cleaned_text)
-                        if s.strip()
-                    ]
+                    sentences = _split_sentences(cleaned_text)
             except Exception as e:
                 print(f"Warning: Error during sentence tokenization: {e}")
                 # Fallback to simple sentence splitting
-                sentences = [
-                    s.strip() for s in re.split(r"[.!?]+", cleaned_text) if s.strip()
-                ]
+                sentences = _split_sentences(cleaned_text)
 
             if not sentences:
                 return {
@@ -211,31 +263,34 @@ class TextSummarizer:
                 max_length = None
 
             if not max_length:
+                # Concise summary: 30% of original length, detailed: 60%
+                cfg = self._settings(summary_type)
                 try:
                     original_word_count = count_words(cleaned_text)
-                    if summary_type == "concise":
-                        # Concise summary: 20-30% of original length
-                        max_length = max(30, min(int(original_word_count * 0.3), 200))
-                    else:
-                        # Detailed summary: 40-60% of original length
-                        max_length = max(50, min(int(original_word_count * 0.6), 500))
+                    max_length = max(
+                        cfg["floor"],
+                        min(int(original_word_count * cfg["frac"]), cfg["cap"]),
+                    )
                 except Exception as e:
                     print(f"Warning: Error calculating max_length: {e}")
                     # Fallback to safe default
-                    max_length = 100 if summary_type == "concise" else 200
+                    max_length = cfg["default"]
 
             # Calculate sentence scores with error handling
             try:
-                sentence_scores = self._score_sentences(sentences, summary_type)
+                sentence_scores, word_counts = self._score_sentences(
+                    sentences, summary_type
+                )
             except Exception as e:
                 print(f"Warning: Error scoring sentences: {e}")
                 # Fallback to equal weights for all sentences
-                sentence_scores = {i: 1.0 for i in range(len(sentences))}
+                sentence_scores = [1.0] * len(sentences)
+                word_counts = None
 
             # Select top sentences with error handling
             try:
                 summary_sentences = self._select_top_sentences(
-                    sentences, sentence_scores, max_length
+                    sentences, sentence_scores, max_length, word_counts
                 )
             except Exception as e:
                 print(f"Warning: Error selecting top sentences: {e}")
@@ -292,80 +347,86 @@ class TextSummarizer:
             summary_type (str): Type of summary to generate
 
         Returns:
-            dict: Dictionary of sentence scores
+            tuple: List of sentence scores and a list of sentence word counts,
+                or None for the counts if scoring failed
         """
         try:
-            # Combine all sentences into a single text for word frequency analysis
-            full_text = " ".join(sentences)
-
-            # Tokenize and remove stop words
-            try:
-                words = word_tokenize(full_text.lower())
-            except Exception as e:
-                print(f"Warning: Error tokenizing words: {e}")
-                # Fallback to simple word splitting
-                words = re.findall(r"\b\w+\b", full_text.lower())
+            # Tokenize each sentence once into parallel lists: the content
+            # words (stop words and punctuation removed), the token count used
+            # for length normalization and the word count used to fit max_length
+            stop_words = self.stop_words
+            content_words = []
+            token_counts = []
+            sentence_word_counts = []
+            for sentence in sentences:
+                try:
+                    # Already split into sentences, so skip word_tokenize's own
+                    # Punkt sentence pass
+                    tokens = word_tokenize(sentence.lower(), preserve_line=True)
+                except Exception:
+                    # Fallback to simple word splitting
+                    tokens = re.findall(r"\b\w+\b", sentence.lower())
+                content_words.append(
+                    [
+                        word
+                        for word in tokens
+                        if word.isalnum() and word not in stop_words
+                    ]
+                )
+                token_counts.append(len(tokens))
+                sentence_word_counts.append(count_words(sentence))
 
-            word_freq = FreqDist(
-                word for word in words if word.isalnum() and word not in self.stop_words
-            )
+            term_counts = Counter(chain.from_iterable(content_words))
 
             # Max word frequency for normalization
-            max_freq = max(word_freq.values()) if word_freq else 1
+            max_freq = max(term_counts.values()) if term_counts else 1
 
-            # Normalize word frequencies
-            for word in word_freq:
-                word_freq[word] = word_freq[word] / max_freq
+            # Normalize word frequencies into a plain dict in one pass
+            word_freq = {word: count / max_freq for word, count in term_counts.items()}
 
-            # Score sentences
-            sentence_scores = defaultdict(float)
+            # Position bias - earlier sentences often contain key information
+            # But for detailed summaries, we want content from throughout the
+            # text, so their weights decay more gently. The weights never
+            # run out; zip stops at the last sentence.
+            position_weights = self._position_weights(summary_type, len(sentences))
 
-            for i, sentence in enumerate(sentences):
-                try:
-                    sent_words = word_tokenize(sentence.lower())
-                except Exception:
-                    # Fallback to simple word splitting
-                    sent_words = re.findall(r"\b\w+\b", sentence.lower())
+            # Score sentences, one list entry per sentence
+            sentence_scores = []
 
-                for word in sent_words:
-                    if word in word_freq:
-                        # Add word importance to sentence score
-                        sentence_scores[i] += word_freq[word]
+            for words, token_count, position_weight in zip(
+                content_words, token_counts, position_weights
+            ):
+                # Add word importance to sentence score, summed in C; every
+                # content word has a frequency
+                score = sum(map(word_freq.__getitem__, words), 0.0)
 
                 # Normalize by sentence length to avoid bias towards longer sentences
                 # But not too much - we still want to favor information-rich sentences
-                if len(sent_words) > 0:
-                    divisor = (
-                        len(sent_words) ** 0.5
-                    )  # Square root for softer normalization
-                    sentence_scores[i] = sentence_scores[i] / divisor
-
-                # Position bias - earlier sentences often contain key information
-                # But for detailed summaries, we want content from throughout the text
-                if summary_type == "concise":
-                    # Stronger position bias for concise summaries
-                    position_weight = 1.0 if i == 0 else 0.95 ** (i)
-                    sentence_scores[i] *= position_weight
-                else:
-                    # Gentler position bias for detailed summaries
-                    position_weight = 1.0 if i == 0 else 0.98 ** (i)
-                    sentence_scores[i] *= position_weight
+                if token_count > 0:
+                    divisor = token_count**0.5  # Square root for softer normalization
+                    score = score / divisor
+
+                sentence_scores.append(score * position_weight)
 
-            return sentence_scores
+            return sentence_scores, sentence_word_counts
 
         except Exception as e:
             print(f"Error in _score_sentences: {str(e)}")
             # Return equal weights as fallback
-            return {i: 1.0 for i in range(len(sentences))}
+            return [1.0] * len(sentences), None
 
-    def _select_top_sentences(self, sentences, sentence_scores, max_length):
+    def _select_top_sentences(
+        self, sentences, sentence_scores, max_length, word_counts=None
+    ):
         """
         Select top sentences for the summary based on scores and max length
 
         Args:
             sentences (list): List of sentences
-            sentence_scores (dict): Dictionary of sentence scores
+            sentence_scores (list): Score of each sentence
             max_length (int): Maximum length of summary in words
+            word_counts (list, optional): Word count of each sentence, counted
+                while scoring
 
         Returns:
             list: Selected sentences for the summary
@@ -375,41 +436,48 @@ class TextSummarizer:
             if not sentences or not sentence_scores:
                 return sentences[:1] if sentences else []
 
-            # Get top sentences (by index) based on scores
+            # Rank sentence indices by score, highest first; the sort is
+            # stable, so equal scores keep their original order
             try:
-                top_sentence_indices = nlargest(
-                    len(sentences), sentence_scores, key=sentence_scores.get
+                ranked_indices = sorted(
+                    range(len(sentence_scores)),
+                    key=sentence_scores.__getitem__,
+                    reverse=True,
                 )
             except Exception as e:
                 print(f"Warning: Error selecting top sentences: {e}")
                 # Fallback to using the original order
-                top_sentence_indices = list(range(min(5, len(sentences))))
-
-            # Sort indices to maintain original order
-            top_sentence_indices.sort()
+                ranked_indices = list(range(min(5, len(sentences))))
 
-            # Build summary, respecting max_length
-            summary_sentences = []
+            # Take the best sentences that fit, respecting max_length; a
+            # sentence too long for what is left is skipped so shorter,
+            # lower ranked ones can still fill the budget
+            selected_indices = []
             word_count = 0
 
-            for i in top_sentence_indices:
+            for i in ranked_indices:
                 if i >= len(sentences):
                     continue  # Skip invalid indices
 
-                sentence = sentences[i]
-                try:
-                    sentence_word_count = count_words(sentence)
-                except Exception:
-                    # Fallback word count
-                    sentence_word_count = len(sentence.split())
+                if word_counts is not None:
+                    sentence_word_count = word_counts[i]
+                else:
+                    try:
+                        sentence_word_count = count_words(sentences[i])
+                    except Exception:
+                        # Fallback word count
+                        sentence_word_count = len(sentences[i].split())
 
                 if word_count + sentence_word_count <= max_length:
-                    summary_sentences.append(sentence)
+                    selected_indices.append(i)
                     word_count += sentence_word_count
-                else:
-                    break
+                    if word_count >= max_length:
+                        break
+
+            # Sort indices to maintain original order
+            selected_indices.sort()
 
-            return summary_sentences
+            return [sentences[i] for i in selected_indices]
 
         except Exception as e:
             print(f"Error in _select_top_sentences: {str(e)}")
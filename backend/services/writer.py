@@ -0,0 +1,136 @@
+from collections import defaultdict, deque
+import threading
+from app.extensions import db
+import logging
+import sqlalchemy as sa
+
+logger = logging.getLogger(__name__)
+
+
+class RecordWriterService:
+    """Service that batches database inserts in a background thread"""
+
+    def __init__(self, app=None):
+        self.app = app
+        self.writer_thread = None
+        self.running = False
+        self._queue = deque()
+        self._wakeup = threading.Event()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize with Flask app"""
+        self.app = app
+
+    def start(self):
+        """Start the writer service in a background thread"""
+        if self.writer_thread is not None and self.writer_thread.is_alive():
+            logger.info("Record writer service is already running")
+            return
+
+        self.running = True
+        self.writer_thread = threading.Thread(target=self._writer_worker, daemon=True)
+        self.writer_thread.start()
+        logger.info("Record writer service started")
+
+    def stop(self):
+        """Stop the writer service, flushing any queued records"""
+        self.running = False
+        self._wakeup.set()
+        if self.writer_thread is not None:
+            self.writer_thread.join(timeout=5.0)
+            logger.info("Record writer service stopped")
+
+    def submit(self, model, values):
+        """
+        Queue a row for insertion
+
+        Args:
+            model: SQLAlchemy model class to insert into
+            values (dict): Column values for the new row
+
+        Returns:
+            bool: False if the row was not queued and must be written synchronously
+        """
+        # A forked or preloaded worker inherits the flag but not the thread
+        if (
+            not self.running
+            or self.writer_thread is None
+            or not self.writer_thread.is_alive()
+        ):
+            return False
+
+        if len(self._queue) >= self.app.config["WRITE_QUEUE_SIZE"]:
+            return False
+
+        self._queue.append((model, values))
+
+        # Wake the worker early once a full batch is waiting
+        if len(self._queue) >= self.app.config["WRITE_BATCH_SIZE"]:
+            self._wakeup.set()
+
+        return True
+
+    def _writer_worker(self):
+        """Background worker that drains the queue"""
+        with self.app.app_context():
+            flush_interval = self.app.config["WRITE_FLUSH_INTERVAL"]
+            logger.info(f"Record writer flushing every {flush_interval} seconds")
+
+            while self.running:
+                self._wakeup.wait(flush_interval)
+                self._wakeup.clear()
+
+                try:
+                    self._flush()
+                except Exception as e:
+                    logger.error(f"Error during record flush: {str(e)}")
+
+            # Drain whatever is left before exiting
+            try:
+                self._flush()
+            except Exception as e:
+                logger.error(f"Error during final record flush: {str(e)}")
+
+    def _flush(self):
+        """Insert queued rows, one transaction and one executemany per batch"""
+        batch_size = self.app.config["WRITE_BATCH_SIZE"]
+
+        while self._queue:
+            rows = defaultdict(list)
+            for _ in range(min(batch_size, len(self._queue))):
+                model, values = self._queue.popleft()
+                rows[model].append(values)
+
+            try:
+                for model, values in rows.items():
+                    db.session.execute(sa.insert(model), values)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.warning(f"Batch insert failed, retrying row by row: {str(e)}")
+                self._insert_rows(rows)
+
+    def _insert_rows(self, rows):
+        """Insert rows one transaction each, so one bad row doesn't lose the rest"""
+        dropped = 0
+        for model, values in rows.items():
+            for row in values:
+                try:
+                    db.session.execute(sa.insert(model), row)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    # Not re-queued, as a row the database rejects would be
+                    # retried forever
+                    dropped += 1
+                    logger.debug(f"Queued record rejected: {str(e)}")
+
+        if dropped:
+            logger.error(f"Dropped {dropped} queued records after failed inserts")
+
+
+# Singleton instance
+record_writer = RecordWriterService()
@@ -3,42 +3,43 @@ import ssl
 import stat
 import secrets
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+# NLTK resources used by the app, as (download name, data path) pairs
+NLTK_RESOURCES = [
+    ("punkt", "tokenizers/punkt"),
+    ("stopwords", "corpora/stopwords"),
+    ("wordnet", "corpora/wordnet"),
+    ("punkt_tab", "tokenizers/punkt_tab"),
+]
+
+
+def _nltk_resource_installed(path):
+    """Check whether an NLTK resource is on the data path"""
+    from nltk.data import find
+
+    try:
+        find(path)
+        return True
+    except LookupError:
+        return False
+
 
 def setup_nltk():
     """Download required NLTK resources with proper SSL handling if not already installed"""
     print("\n--- Setting up NLTK Resources ---")
 
     try:
-        import nltk
-        from nltk.data import find
+        from nltk.downloader import Downloader
 
         # Check if resources are already installed
         resources_needed = []
-
-        try:
-            find("tokenizers/punkt")
-            print("punkt resource is already installed.")
-        except LookupError:
-            resources_needed.append("punkt")
-
-        try:
-            find("corpora/stopwords")
-            print("stopwords resource is already installed.")
-        except LookupError:
-            resources_needed.append("stopwords")
-        try:
-            find("corpora/wordnet")
-            print("wordnet resource is already installed.")
-        except LookupError:
-            resources_needed.append("wordnet")
-
-        try:
-            find("punkt_tab")
-            print("punkt_tab resource is already installed.")
-        except LookupError:
-            resources_needed.append("punkt_tab")
+        for resource, path in NLTK_RESOURCES:
+            if _nltk_resource_installed(path):
+                print(f"{resource} resource is already installed.")
+            else:
+                resources_needed.append(resource)
 
         # If any resources need to be downloaded
         if resources_needed:
@@ -53,10 +54,28 @@ def setup_nltk():
             else:
                 ssl._create_default_https_context = _create_unverified_https_context
 
-            # Download only the missing resources
-            for resource in resources_needed:
-                nltk.download(resource)
-                print(f"Downloaded {resource} successfully")
+            # Download only the missing resources, concurrently since each one
+            # waits on the network. Every thread gets its own Downloader, as
+            # the shared default one caches the package index without a lock.
+            failed = []
+            with ThreadPoolExecutor(max_workers=len(resources_needed)) as executor:
+                futures = {
+                    executor.submit(
+                        Downloader().download, resource, quiet=True
+                    ): resource
+                    for resource in resources_needed
+                }
+                for future in as_completed(futures):
+                    resource = futures[future]
+                    if future.result():
+                        print(f"Downloaded {resource} successfully")
+                    else:
+                        print(f"Failed to download {resource}")
+                        failed.append(resource)
+
+            if failed:
+                print(f"Could not download NLTK resources: {', '.join(failed)}")
+                return False
 
             print("All required NLTK resources are now installed!")
         else:
@@ -90,43 +109,32 @@ def setup_env_file():
         with open(env_file, "r") as f:
             env_content = f.read()
 
-        # Update existing .env file
+        # Update existing .env file, indexing its KEY=value lines once so
+        # settings can be replaced or added in place; comments and other lines
+        # are kept as they are. A key can appear more than once and dotenv
+        # loads the last one, so every line for a key is indexed.
         lines = env_content.split("\n")
-        updated_lines = []
-
-        # Keep track of what we've updated
-        updated_secret_key = False
-        updated_database_url = False
-        updated_cleanup_interval = False
-        updated_max_records = False
-
-        for line in lines:
-            if line.startswith("SECRET_KEY="):
-                updated_lines.append(f"SECRET_KEY={secret_key}")
-                updated_secret_key = True
-            elif line.startswith("DATABASE_URL="):
-                updated_lines.append(f"DATABASE_URL={database_url}")
-                updated_database_url = True
-            elif line.startswith("DATA_CLEANUP_INTERVAL="):
-                updated_cleanup_interval = True
-                updated_lines.append(line)
-            elif line.startswith("MAX_RECORDS_PER_TABLE="):
-                updated_max_records = True
-                updated_lines.append(line)
-            else:
-                updated_lines.append(line)
-
-        # Add missing configurations
-        if not updated_secret_key:
-            updated_lines.append(f"SECRET_KEY={secret_key}")
-        if not updated_database_url:
-            updated_lines.append(f"DATABASE_URL={database_url}")
-        if not updated_cleanup_interval:
-            updated_lines.append("DATA_CLEANUP_INTERVAL=3600")  # 1 hour in seconds
-        if not updated_max_records:
-            updated_lines.append("MAX_RECORDS_PER_TABLE=1000")  # Max records per table
-
-        new_content = "\n".join(updated_lines)
+        key_lines = {}
+        for index, line in enumerate(lines):
+            key, sep, _ = line.partition("=")
+            if sep and not line.startswith("#"):
+                key_lines.setdefault(key, []).append(index)
+
+        # (key, value, whether an existing value is replaced)
+        settings = [
+            ("SECRET_KEY", secret_key, True),
+            ("DATABASE_URL", database_url, True),
+            ("DATA_CLEANUP_INTERVAL", "3600", False),  # 1 hour in seconds
+            ("MAX_RECORDS_PER_TABLE", "1000", False),  # Max records per table
+        ]
+        for key, value, overwrite in settings:
+            if key not in key_lines:
+                lines.append(f"{key}={value}")
+            elif overwrite:
+                for index in key_lines[key]:
+                    lines[index] = f"{key}={value}"
+
+        new_content = "\n".join(lines)
     else:
         # Create new .env file with basic configuration and absolute database path
         new_content = f"""FLASK_APP=run.py
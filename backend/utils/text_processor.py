@@ -1,5 +1,22 @@
 import re
-from nltk.tokenize import word_tokenize
+
+# clean_text patterns
+_WS_RE = re.compile(r"\s+")
+_PUNCT_SPACE_RE = re.compile(r"\s+([.,;:!?)])")
+_PAREN_RE = re.compile(r"(\()\s+")
+_DUP_PUNCT_RE = re.compile(r"([.,!?]){2,}")
+_URL_RE = re.compile(r"https?://\S+")
+# Matches wherever one of the patterns above (other than _WS_RE) would
+_NEEDS_FIXES_RE = re.compile(r"\s[.,;:!?)]|\(\s|[.,!?]{2}|https?://")
+
+# Common words used by detect_language
+_ENGLISH_COMMON = frozenset({"the", "and", "is", "in", "to", "it", "of"})
+_SPANISH_COMMON = frozenset({"el", "la", "de", "en", "que", "y", "es"})
+_FRENCH_COMMON = frozenset({"le", "la", "de", "et", "en", "un", "une"})
+
+# Runs of word characters, joined across apostrophes and hyphens ("don't",
+# "well-known"); count_words keeps the ones containing a letter
+_WORD_COUNT_RE = re.compile(r"\w+(?:['\-]\w+)*")
 
 
 def clean_text(text):
@@ -15,21 +32,26 @@ def clean_text(text):
     if not text:
         return ""
 
-    # Normalize whitespace
-    text = re.sub(r"\s+", " ", text)
+    # Already-clean text only needs its whitespace collapsed, which split and
+    # join do without the regex passes
+    if not _NEEDS_FIXES_RE.search(text):
+        return " ".join(text.split())
+
+    # Every pattern treats any whitespace run alike, so whitespace is only
+    # normalized once, at the end
 
     # Fix spacing around punctuation
-    text = re.sub(r"\s+([.,;:!?)])", r"\1", text)
-    text = re.sub(r"(\()\s+", r"\1", text)
+    text = _PUNCT_SPACE_RE.sub(r"\1", text)
+    text = _PAREN_RE.sub(r"\1", text)
 
     # Remove excessive punctuation
-    text = re.sub(r"([.,!?]){2,}", r"\1", text)
+    text = _DUP_PUNCT_RE.sub(r"\1", text)
 
     # Remove URL artifacts
-    text = re.sub(r"https?://\S+", "", text)
+    text = _URL_RE.sub("", text)
 
-    # Fix common spacing issues
-    text = re.sub(r"\s+", " ", text)
+    # Normalize whitespace
+    text = _WS_RE.sub(" ", text)
     text = text.strip()
 
     return text
@@ -48,13 +70,11 @@ def count_words(text):
     if not text:
         return 0
 
-    # Tokenize text to get words
-    words = word_tokenize(text)
-
-    # Filter out punctuation and other non-word tokens
-    words = [word for word in words if any(c.isalpha() for c in word)]
-
-    return len(words)
+    # Punctuation never matches; tokens without a letter (numbers, superscript
+    # digits) are not words. map keeps the letter check in C.
+    return sum(
+        1 for word in _WORD_COUNT_RE.findall(text) if any(map(str.isalpha, word))
+    )
 
 
 def truncate_text(text, max_length, add_ellipsis=True):
@@ -120,20 +140,14 @@ def detect_language(text):
     """
     # Simple language detection based on common words
     # This is just a basic implementation
-    english_common = ["the", "and", "is", "in", "to", "it", "of"]
-    spanish_common = ["el", "la", "de", "en", "que", "y", "es"]
-    french_common = ["le", "la", "de", "et", "en", "un", "une"]
-
     text_lower = text.lower()
 
-    # Count occurrences of common words
-    english_count = sum(
-        1 for word in english_common if f" {word} " in f" {text_lower} "
-    )
-    spanish_count = sum(
-        1 for word in spanish_common if f" {word} " in f" {text_lower} "
-    )
-    french_count = sum(1 for word in french_common if f" {word} " in f" {text_lower} ")
+    # Count the common words that appear as space-separated words, splitting
+    # the text once instead of searching it for each word
+    words = set(text_lower.split(" "))
+    english_count = len(_ENGLISH_COMMON & words)
+    spanish_count = len(_SPANISH_COMMON & words)
+    french_count = len(_FRENCH_COMMON & words)
 
     # Determine language based on counts
     counts = {"en": english_count, "es": spanish_count, "fr": french_count}